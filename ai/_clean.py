@@ -0,0 +1,72 @@
+"""Очистка ответов моделей от ссылок на источники"""
+
+import re
+
+
+def _strip_citations(text: str) -> str:
+    """Удалить ссылки на источники вида [1] (поиск только по символу "[")"""
+    pos = text.find('[')
+    if pos < 0:
+        return text
+    
+    parts: list[str] = []
+    start = 0
+    while pos >= 0:
+        end = pos + 1
+        while end < len(text) and text[end].isdecimal():
+            end += 1
+        if end > pos + 1 and end < len(text) and text[end] == ']':
+            parts.append(text[start:pos])
+            start = end + 1
+            pos = text.find('[', start)
+        else:
+            pos = text.find('[', pos + 1)
+    parts.append(text[start:])
+    return ''.join(parts)
+
+
+def clean_response(text: str) -> str:
+    """Очистка ответа от квадратных скобок с цифрами (ссылки на источники)"""
+    text = _strip_citations(text)
+    
+    # Схлопывание пробелов и табуляций; переводы строк сохраняются, чтобы не ломать Markdown
+    if '\t' in text:
+        text = text.replace('\t', ' ')
+    while '  ' in text:
+        text = text.replace('  ', ' ')
+    
+    # Удаление пробела в начале строк
+    return text.replace('\n ', '\n')
+
+
+# Хвост текста, который может стать частью серии после следующего чанка:
+# пробелы, ссылки и незаконченная ссылка ("[", "[12"), возможно после перевода строки
+_RE_PENDING_TAIL = re.compile(r'\n?(?:[ \t]|\[\d+\])*(?:\[\d*)?$')
+
+
+class StreamCleaner:
+    """
+    Очистка ответа, поступающего по частям
+    
+    Результат feed()/flush() совпадает с clean_response() для всего текста:
+    незавершенная серия пробелов и ссылок в конце чанка придерживается,
+    пока следующий чанк не покажет, чем она заканчивается.
+    """
+    
+    def __init__(self) -> None:
+        self._pending: str = ""
+    
+    def feed(self, chunk: str) -> str:
+        """Добавить чанк и вернуть очищенный текст, который уже не изменится"""
+        text = self._pending + chunk
+        match = _RE_PENDING_TAIL.search(text)
+        # Шаблон допускает пустое совпадение в конце, поэтому match всегда найден
+        assert match is not None
+        split = match.start()
+        self._pending = text[split:]
+        return clean_response(text[:split])
+    
+    def flush(self) -> str:
+        """Вернуть очищенный остаток в конце ответа"""
+        text, self._pending = self._pending, ""
+        return clean_response(text)
@@ -0,0 +1,54 @@
+"""Отрисовка streaming ответа в терминале"""
+
+import time
+from typing import AsyncIterable, List
+
+from rich.console import Console
+from rich.live import Live
+from rich.markdown import Markdown
+
+from ai._clean import StreamCleaner
+
+
+async def render_stream(
+    chunks: AsyncIterable[str],
+    console: Console,
+    clean: bool = True,
+    refresh_per_second: int = 10,
+    vertical_overflow: str = "ellipsis",
+) -> str:
+    """
+    Отрисовать поток чанков как Markdown и вернуть итоговый текст
+    
+    Markdown пересобирается не чаще refresh_per_second раз в секунду: Live все равно
+    не выводит на экран чаще, а каждая пересборка разбирает весь накопленный ответ.
+    При clean=True ответ по мере поступления очищается от ссылок на источники.
+    """
+    cleaner = StreamCleaner() if clean else None
+    parts: List[str] = []
+    interval = 1 / refresh_per_second
+    last_update = time.monotonic()
+    
+    with Live(
+        Markdown(""),
+        console=console,
+        refresh_per_second=refresh_per_second,
+        vertical_overflow=vertical_overflow,
+    ) as live:
+        async for chunk in chunks:
+            if cleaner is not None:
+                chunk = cleaner.feed(chunk)
+            if chunk:
+                parts.append(chunk)
+            
+            now = time.monotonic()
+            if now - last_update >= interval:
+                live.update(Markdown("".join(parts)))
+                last_update = now
+        
+        if cleaner is not None:
+            parts.append(cleaner.flush())
+        text = "".join(parts)
+        live.update(Markdown(text))
+    
+    return text
@@ -0,0 +1,111 @@
+"""Обработчики логирования"""
+
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+# Максимум буферов в одном вызове writev
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+# -1 означает "нет ограничения или неизвестно"
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+
+class BatchedFileHandler(logging.Handler):
+    """
+    Файловый обработчик, который пишет записи пачками
+    
+    Записи кодируются и копятся в памяти, а затем уходят в файл одним вызовом
+    os.writev: при заполнении буфера, на записи уровня flush_level и выше,
+    если с прошлого сброса прошло flush_interval секунд, и при закрытии.
+    Директория и файл создаются только при первом сбросе, поэтому запуски,
+    которые ничего не логируют, не трогают файловую систему.
+    """
+    
+    def __init__(
+        self,
+        filename: Path,
+        encoding: str = "utf-8",
+        capacity: int = 256,
+        flush_level: int = logging.ERROR,
+        flush_interval: float = 1.0,
+    ):
+        super().__init__()
+        self.filename = Path(filename)
+        self.encoding = encoding
+        self.capacity = capacity
+        self.flush_level = flush_level
+        self.flush_interval = flush_interval
+        self._fd: Optional[int] = None
+        self._buffer: List[bytes] = []
+        self._last_flush = time.monotonic()
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._buffer.append(f"{self.format(record)}\n".encode(self.encoding))
+            if (
+                len(self._buffer) >= self.capacity
+                or record.levelno >= self.flush_level
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                self._flush_buffer()
+        except Exception:
+            self.handleError(record)
+    
+    def flush(self):
+        self.acquire()
+        try:
+            self._flush_buffer()
+        except OSError:
+            # flush вызывается и из logging.shutdown - ошибка записи не должна ронять выход
+            pass
+        finally:
+            self.release()
+    
+    def close(self):
+        self.acquire()
+        try:
+            self.flush()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        finally:
+            self.release()
+        super().close()
+    
+    def _flush_buffer(self):
+        """Записать накопленные записи в файл (вызывается под блокировкой обработчика)"""
+        chunks, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        if not chunks:
+            return
+        
+        if self._fd is None:
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.filename, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        
+        if not hasattr(os, "writev"):
+            data = memoryview(b"".join(chunks))
+            while data:
+                written = os.write(self._fd, data)
+                if written == 0:
+                    raise OSError(f"write не записал ни одного байта в {self.filename}")
+                data = data[written:]
+            return
+        
+        # writev может записать не все: пропускаем записанные буферы и дописываем остаток
+        index = 0
+        while index < len(chunks):
+            written = os.writev(self._fd, chunks[index:index + _IOV_MAX])
+            if written == 0:
+                raise OSError(f"writev не записал ни одного байта в {self.filename}")
+            while index < len(chunks) and written >= len(chunks[index]):
+                written -= len(chunks[index])
+                index += 1
+            if written:
+                chunks[index] = chunks[index][written:]
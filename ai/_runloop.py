@@ -0,0 +1,54 @@
+"""Выбор реализации event loop для команд"""
+
+import asyncio
+import platform
+import sys
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+# uvloop (libuv) быстрее стандартного loop, но доступен только для CPython вне Windows
+uvloop = None
+if sys.platform != "win32" and platform.python_implementation() == "CPython":
+    try:
+        import uvloop
+    except ImportError:
+        uvloop = None
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """Создать event loop (uvloop, если установлен)"""
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def run_oneshot(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Выполнить корутину команды в новом event loop и закрыть его
+    
+    В отличие от asyncio.run и asyncio.Runner обработчик SIGINT не
+    устанавливается: Ctrl+C приходит в команду обычным KeyboardInterrupt,
+    который команды обрабатывают сами.
+    """
+    loop = new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            _cancel_all_tasks(loop)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            loop.close()
+
+
+def _cancel_all_tasks(loop: asyncio.AbstractEventLoop):
+    """Отменить задачи, оставшиеся после прерывания команды"""
+    pending = asyncio.all_tasks(loop)
+    if not pending:
+        return
+    
+    for task in pending:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
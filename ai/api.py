@@ -3,9 +3,11 @@
 import asyncio
 import logging
 import threading
-import queue as thread_queue
-from typing import AsyncIterator, List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 
+import httpx
 from openai import AsyncOpenAI
 from anthropic import Anthropic
 from rich.console import Console
@@ -15,6 +17,147 @@ from ai.config import config
 console = Console()
 logger = logging.getLogger(__name__)
 
+# Маркер завершения потока чанков
+_SENTINEL = object()
+
+# Максимум чанков в очереди между streaming потоком и event loop
+_STREAM_QUEUE_SIZE = 64
+
+# Пул потоков для блокирующих вызовов синхронного Anthropic клиента
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="anthropic-io")
+
+
+@lru_cache(maxsize=128)
+def _classify_model(model: str) -> Tuple[str, str]:
+    """Определить провайдера ("anthropic", "openai", "openrouter") и endpoint для модели"""
+    model_lower = model.lower()
+    
+    # Anthropic модели используют нативный endpoint
+    if "claude" in model_lower or "anthropic" in model_lower:
+        return "anthropic", "https://api.proxyapi.ru/anthropic"
+    elif model_lower.startswith("openai/"):
+        return "openai", "https://api.proxyapi.ru/openai/v1"
+    else:
+        # Все остальные модели через OpenRouter endpoint
+        return "openrouter", "https://api.proxyapi.ru/openrouter/v1"
+
+
+async def _select_anthropic_model(client: Anthropic, variants: List[str]) -> str:
+    """
+    Найти первый доступный вариант названия модели
+    
+    Все варианты проверяются параллельно минимальным запросом в 1 токен,
+    выбирается первый рабочий в порядке списка. Ожидание равно самой
+    медленной проверке до него, а не сумме всех неудачных попыток.
+    """
+    loop = asyncio.get_running_loop()
+    probes = [
+        loop.run_in_executor(_EXECUTOR, partial(
+            client.messages.create,
+            model=variant,
+            max_tokens=1,
+            messages=[{"role": "user", "content": "ping"}],
+        ))
+        for variant in variants
+    ]
+    
+    try:
+        for variant, probe in zip(variants, probes):
+            try:
+                await probe
+            except Exception:
+                continue
+            return variant
+    finally:
+        # Результаты остальных проверок больше не нужны
+        for probe in probes:
+            probe.cancel()
+    
+    raise Exception("Не удалось найти подходящий формат модели")
+
+
+def build_anthropic_messages(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Преобразовать сообщения из формата OpenAI в формат Anthropic"""
+    # content может быть строкой или списком блоков, Anthropic принимает оба варианта
+    anthropic_messages = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in messages
+        if msg["role"] in ("user", "assistant")
+    ]
+    
+    # Если было system сообщение (учитывается последнее), добавляем его в начало как user
+    system_content = next(
+        (msg["content"] for msg in reversed(messages) if msg["role"] == "system"),
+        None,
+    )
+    if system_content:
+        anthropic_messages.insert(0, {
+            "role": "user",
+            "content": f"System: {system_content}"
+        })
+    
+    return anthropic_messages
+
+
+async def _run_anthropic_stream(client: Anthropic, kwargs: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Streaming синхронного Anthropic клиента как асинхронный итератор
+    
+    Синхронный stream читается в executor, чанки передаются в event loop
+    через call_soon_threadsafe, поэтому потребитель просто ждет очередь
+    без опроса по таймауту. Producer поток ждет свободного места, если
+    в очереди уже _STREAM_QUEUE_SIZE непрочитанных чанков.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(_STREAM_QUEUE_SIZE)
+    stopped = threading.Event()
+    
+    def _produce():
+        """Синхронная функция для streaming в отдельном потоке"""
+        try:
+            with client.messages.stream(**kwargs) as stream_response:
+                for text_delta in stream_response.text_stream:
+                    slots.acquire()
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, text_delta)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _SENTINEL)
+    
+    producer = loop.run_in_executor(_EXECUTOR, _produce)
+    
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is _SENTINEL:
+                break
+            slots.release()
+            yield chunk
+        
+        # Поток уже завершился; ошибка streaming, если была, пробрасывается отсюда
+        await producer
+    finally:
+        # Если чтение прервано раньше времени, будим producer, чтобы он закрыл stream
+        stopped.set()
+        slots.release()
+
+
+async def _run_anthropic_sync(client: Anthropic, kwargs: Dict[str, Any]) -> str:
+    """Получить полный ответ синхронного Anthropic клиента в executor"""
+    loop = asyncio.get_running_loop()
+    response = await loop.run_in_executor(_EXECUTOR, partial(client.messages.create, **kwargs))
+    return response.content[0].text
+
+
+async def _run_anthropic(client: Anthropic, kwargs: Dict[str, Any], stream: bool) -> AsyncIterator[str]:
+    """Выполнить запрос к Anthropic (streaming или полный ответ)"""
+    if stream:
+        async for chunk in _run_anthropic_stream(client, kwargs):
+            yield chunk
+    else:
+        yield await _run_anthropic_sync(client, kwargs)
+
 
 class ProxyAPIClient:
     """Клиент для работы с ProxyAPI через OpenAI-совместимый интерфейс"""
@@ -23,41 +166,48 @@ class ProxyAPIClient:
         self.api_key = config.api_key
         self.base_url = config.base_url
         self.timeout = 60.0
-    
-    def _is_anthropic_model(self, model: str) -> bool:
-        """Проверить, является ли модель Anthropic"""
-        model_lower = model.lower()
-        return "claude" in model_lower or "anthropic" in model_lower
-    
-    def _get_endpoint_for_model(self, model: str) -> str:
-        """Определить правильный endpoint для модели"""
-        model_lower = model.lower()
-        
-        # Anthropic модели используют нативный endpoint
-        if self._is_anthropic_model(model):
-            return "https://api.proxyapi.ru/anthropic"
-        elif model_lower.startswith("openai/"):
-            return "https://api.proxyapi.ru/openai/v1"
-        else:
-            # Все остальные модели через OpenRouter endpoint
-            return "https://api.proxyapi.ru/openrouter/v1"
+        # Клиенты кэшируются по endpoint, чтобы переиспользовать пул соединений
+        self._clients: Dict[Tuple[str, str], Any] = {}
     
     def _get_client(self, model: str):
         """Получить клиент с правильным endpoint для модели"""
-        if self._is_anthropic_model(model):
+        key = _classify_model(model)
+        provider, endpoint = key
+        
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        
+        if provider == "anthropic":
             # Используем нативный Anthropic клиент
-            return Anthropic(
+            client = Anthropic(
                 api_key=self.api_key,
-                base_url="https://api.proxyapi.ru/anthropic",
+                base_url=endpoint,
             )
         else:
-            # Используем OpenAI-совместимый клиент
-            endpoint = self._get_endpoint_for_model(model)
-            return AsyncOpenAI(
+            # Используем OpenAI-совместимый клиент с keep-alive и HTTP/2
+            client = AsyncOpenAI(
                 api_key=self.api_key,
                 base_url=endpoint,
                 timeout=self.timeout,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+                    http2=True,
+                    timeout=self.timeout,
+                ),
             )
+        
+        self._clients[key] = client
+        return client
+    
+    async def aclose(self):
+        """Закрыть закэшированные клиенты и их пулы соединений"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            if isinstance(client, AsyncOpenAI):
+                await client.close()
+            else:
+                client.close()
     
     async def chat_completion(
         self,
@@ -66,6 +216,7 @@ class ProxyAPIClient:
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
         stream: bool = False,
+        anthropic_messages: Optional[List[Dict[str, Any]]] = None,
     ) -> AsyncIterator[str]:
         """
         Выполнить запрос к API
@@ -76,131 +227,44 @@ class ProxyAPIClient:
             temperature: Температура генерации
             max_tokens: Максимальное количество токенов
             stream: Включить streaming ответов
+            anthropic_messages: Уже преобразованные для Anthropic сообщения
+                (если не переданы, преобразуются из messages)
         
         Yields:
             Части ответа (для streaming) или полный ответ
         """
+        is_anthropic = _classify_model(model)[0] == "anthropic"
+        
+        if is_anthropic:
+            # Преобразуем формат сообщений один раз, он же используется при повторных попытках
+            anthropic_kwargs = {
+                "model": model,  # Используем название модели как есть (claude-opus-4-5-20251101)
+                "max_tokens": max_tokens or 4000,
+                "messages": (
+                    anthropic_messages if anthropic_messages is not None
+                    else build_anthropic_messages(messages)
+                ),
+            }
+            
+            if temperature is not None:
+                anthropic_kwargs["temperature"] = temperature
+        
         try:
             # Для Anthropic моделей используем нативный API
-            if self._is_anthropic_model(model):
+            if is_anthropic:
                 client = self._get_client(model)
                 
-                # Преобразуем формат сообщений из OpenAI в Anthropic
-                anthropic_messages = []
-                system_content = None
-                
-                for msg in messages:
-                    if msg["role"] == "system":
-                        system_content = msg["content"]
-                    elif msg["role"] in ["user", "assistant"]:
-                        # Anthropic использует формат, где content может быть строкой или списком
-                        content = msg["content"]
-                        if isinstance(content, str):
-                            anthropic_messages.append({
-                                "role": msg["role"],
-                                "content": content
-                            })
-                        else:
-                            # Если content уже список, используем как есть
-                            anthropic_messages.append({
-                                "role": msg["role"],
-                                "content": content
-                            })
-                
-                # Если было system сообщение, добавляем его в начало как user
-                if system_content:
-                    anthropic_messages.insert(0, {
-                        "role": "user",
-                        "content": f"System: {system_content}"
-                    })
-                
-                kwargs = {
-                    "model": model,  # Используем название модели как есть (claude-opus-4-5-20251101)
-                    "max_tokens": max_tokens or 4000,
-                    "messages": anthropic_messages,
-                }
-                
-                if temperature is not None:
-                    kwargs["temperature"] = temperature
-                
-                # Anthropic API синхронный, используем thread queue для live streaming
-                if stream:
-                    thread_queue_obj = thread_queue.Queue()
-                    stream_error = [None]  # Используем список для передачи ошибки из потока
-                    
-                    def _stream_anthropic():
-                        """Синхронная функция для streaming в отдельном потоке"""
-                        try:
-                            with client.messages.stream(**kwargs) as stream_response:
-                                for text_delta in stream_response.text_stream:
-                                    thread_queue_obj.put(text_delta)
-                        except Exception as e:
-                            stream_error[0] = e
-                            thread_queue_obj.put(("error", e))
-                        finally:
-                            thread_queue_obj.put(None)  # Сигнал завершения
-                    
-                    # Запускаем streaming в отдельном потоке
-                    thread = threading.Thread(target=_stream_anthropic, daemon=True)
-                    thread.start()
-                    
-                    # Читаем чанки из очереди по мере поступления
-                    try:
-                        while True:
-                            try:
-                                # Ждем чанк с таймаутом
-                                chunk = thread_queue_obj.get(timeout=0.1)
-                                
-                                # None означает завершение
-                                if chunk is None:
-                                    break
-                                
-                                # Проверяем, не ошибка ли это
-                                if isinstance(chunk, tuple) and chunk[0] == "error":
-                                    raise chunk[1]
-                                
-                                yield chunk
-                            except thread_queue.Empty:
-                                # Проверяем, завершен ли поток
-                                if not thread.is_alive():
-                                    # Проверяем, есть ли еще данные
-                                    try:
-                                        while True:
-                                            chunk = thread_queue_obj.get_nowait()
-                                            if chunk is None:
-                                                break
-                                            if isinstance(chunk, tuple) and chunk[0] == "error":
-                                                raise chunk[1]
-                                            yield chunk
-                                    except thread_queue.Empty:
-                                        break
-                                continue
-                    finally:
-                        # Ждем завершения потока
-                        thread.join(timeout=5)
-                        
-                        # Если была ошибка в потоке, поднимаем её
-                        if stream_error[0]:
-                            raise stream_error[0]
-                else:
-                    def _create_anthropic():
-                        response = client.messages.create(**kwargs)
-                        return response.content[0].text
-                    
-                    loop = asyncio.get_event_loop()
-                    result = await loop.run_in_executor(None, _create_anthropic)
-                    yield result
+                # Anthropic API синхронный, запросы выполняются в executor
+                async for chunk in _run_anthropic(client, anthropic_kwargs, stream):
+                    yield chunk
             else:
                 # Для остальных моделей используем OpenAI-совместимый API
                 client = self._get_client(model)
-                actual_model = model
-                
                 kwargs = {
-                    "model": actual_model,
+                    "model": model,
                     "messages": messages,
                     "temperature": temperature,
                 }
-                
                 if max_tokens:
                     kwargs["max_tokens"] = max_tokens
                 
@@ -221,112 +285,25 @@ class ProxyAPIClient:
             logger.error(f"API ошибка: {error_msg}")
             
             # Специальная обработка ошибок для Anthropic моделей
-            if self._is_anthropic_model(model) and ("403" in error_msg or "404" in error_msg):
+            if is_anthropic and ("403" in error_msg or "404" in error_msg):
                 console.print("[yellow]Попытка использовать альтернативный формат модели для Anthropic...[/yellow]")
-                # Пробуем разные варианты названия модели
                 try:
-                    client = Anthropic(
-                        api_key=self.api_key,
-                        base_url="https://api.proxyapi.ru/anthropic",
-                    )
+                    client = self._get_client(model)
                     
                     # Пробуем разные варианты названия модели
-                    model_variants = [
+                    model_variants = list(dict.fromkeys([
                         model,  # Как есть в конфиге
                         "claude-opus-4-5-20251101",  # Точное название
                         "claude-3-opus-20240229",  # Стандартная модель Claude 3 Opus
                         "claude-3-5-sonnet-20241022",  # Claude 3.5 Sonnet
-                    ]
-                    
-                    # Преобразуем сообщения для Anthropic
-                    anthropic_messages = []
-                    system_content = None
-                    for msg in messages:
-                        if msg["role"] == "system":
-                            system_content = msg["content"]
-                        elif msg["role"] in ["user", "assistant"]:
-                            content = msg["content"]
-                            anthropic_messages.append({
-                                "role": msg["role"],
-                                "content": content if isinstance(content, str) else content
-                            })
-                    
-                    if system_content:
-                        anthropic_messages.insert(0, {
-                            "role": "user",
-                            "content": f"System: {system_content}"
-                        })
-                    
-                    for variant in model_variants:
-                        try:
-                            kwargs = {
-                                "model": variant,
-                                "max_tokens": max_tokens or 4000,
-                                "messages": anthropic_messages,
-                            }
-                            if temperature is not None:
-                                kwargs["temperature"] = temperature
-                            
-                            loop = asyncio.get_event_loop()
-                            
-                            if stream:
-                                # Используем ту же логику live streaming с threading
-                                retry_queue = thread_queue.Queue()
-                                retry_error = [None]
-                                
-                                def _stream_retry():
-                                    try:
-                                        with client.messages.stream(**kwargs) as stream_response:
-                                            for text_delta in stream_response.text_stream:
-                                                retry_queue.put(text_delta)
-                                    except Exception as e:
-                                        retry_error[0] = e
-                                        retry_queue.put(("error", e))
-                                    finally:
-                                        retry_queue.put(None)
-                                
-                                retry_thread = threading.Thread(target=_stream_retry, daemon=True)
-                                retry_thread.start()
-                                
-                                try:
-                                    while True:
-                                        try:
-                                            chunk = retry_queue.get(timeout=0.1)
-                                            if chunk is None:
-                                                break
-                                            if isinstance(chunk, tuple) and chunk[0] == "error":
-                                                raise chunk[1]
-                                            yield chunk
-                                        except thread_queue.Empty:
-                                            if not retry_thread.is_alive():
-                                                try:
-                                                    while True:
-                                                        chunk = retry_queue.get_nowait()
-                                                        if chunk is None:
-                                                            break
-                                                        if isinstance(chunk, tuple) and chunk[0] == "error":
-                                                            raise chunk[1]
-                                                        yield chunk
-                                                except thread_queue.Empty:
-                                                    break
-                                            continue
-                                finally:
-                                    retry_thread.join(timeout=5)
-                                    if retry_error[0]:
-                                        raise retry_error[0]
-                            else:
-                                def _create_retry():
-                                    response = client.messages.create(**kwargs)
-                                    return response.content[0].text
-                                
-                                result = await loop.run_in_executor(None, _create_retry)
-                                yield result
-                            console.print(f"[green]✓ Использована модель: {variant}[/green]")
-                            return
-                        except Exception:
-                            continue
+                    ]))
                     
-                    raise Exception("Не удалось найти подходящий формат модели")
+                    variant = await _select_anthropic_model(client, model_variants)
+                    kwargs = {**anthropic_kwargs, "model": variant}
+                    async for chunk in _run_anthropic(client, kwargs, stream):
+                        yield chunk
+                    console.print(f"[green]✓ Использована модель: {variant}[/green]")
+                    return
                 except Exception as retry_error:
                     console.print(f"[red]Ошибка при повторной попытке: {retry_error}[/red]")
                     console.print("[yellow]Подсказка: Убедитесь, что модель claude-opus-4-5-20251101 доступна в ProxyAPI[/yellow]")
@@ -351,7 +328,7 @@ class ProxyAPIClient:
         max_tokens: Optional[int] = None,
     ) -> str:
         """Получить полный ответ (не streaming)"""
-        content = ""
+        chunks: List[str] = []
         async for chunk in self.chat_completion(
             model=model,
             messages=messages,
@@ -359,8 +336,25 @@ class ProxyAPIClient:
             max_tokens=max_tokens,
             stream=False,
         ):
-            content += chunk
-        return content
+            chunks.append(chunk)
+        return "".join(chunks)
+    
+    async def get_completion_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """Получить ответ частями по мере генерации (streaming)"""
+        async for chunk in self.chat_completion(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        ):
+            yield chunk
 
 
 # Глобальный экземпляр клиента
@@ -1,11 +1,10 @@
 """Команда ask - одиночные вопросы с ограничением обменов"""
 
-import asyncio
-import re
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.panel import Panel
 
+from ai._live import render_stream
+from ai._runloop import run_oneshot
 from ai.api import api_client
 from ai.config import config
 
@@ -41,20 +40,18 @@ async def ask_command(question: str, verbose: bool = False):
                 console.print(f"[dim]Temperature: 0.4[/dim]")
                 console.print(f"[dim]Max tokens: 1500[/dim]\n")
             
-            # Получить ответ
-            response = await api_client.get_completion(
-                model=config.model_ask,
-                messages=messages,
-                temperature=0.4,
-                max_tokens=1500,
+            # Streaming ответ с отрисовкой Markdown по мере поступления
+            cleaned_response = await render_stream(
+                api_client.chat_completion(
+                    model=config.model_ask,
+                    messages=messages,
+                    temperature=0.4,
+                    max_tokens=1500,
+                    stream=True,
+                ),
+                console,
             )
             
-            # Очистка ответа от квадратных скобок с цифрами (ссылки на источники)
-            cleaned_response = re.sub(r'\[\d+\]', '', response)
-            cleaned_response = re.sub(r'\s+', ' ', cleaned_response)
-            cleaned_response = re.sub(r'\n\s+', '\n', cleaned_response)
-            
-            console.print(Markdown(cleaned_response))
             messages.append({"role": "assistant", "content": cleaned_response})
             
             exchanges_left -= 1
@@ -78,8 +75,10 @@ async def ask_command(question: str, verbose: bool = False):
     except Exception as e:
         console.print(f"[red]Ошибка: {e}[/red]")
         raise
+    finally:
+        await api_client.aclose()
 
 
 def run_ask(question: str, verbose: bool = False):
     """Синхронная обертка для команды ask"""
-    asyncio.run(ask_command(question, verbose))
+    run_oneshot(ask_command(question, verbose))
@@ -1,18 +1,19 @@
 """Команда chat - интерактивный чат с сохранением"""
 
 import asyncio
-import json
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 
+import orjson
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.prompt import Prompt
 from rich.table import Table
 
-from ai.api import api_client
+from ai._live import render_stream
+from ai._runloop import run_oneshot
+from ai.api import api_client, build_anthropic_messages
 from ai.config import config
 
 console = Console()
@@ -27,7 +28,13 @@ Engage naturally in extended dialogues. Ask clarifying questions. Provide detail
 
 
 class ChatSession:
-    """Класс для управления сессией чата"""
+    """
+    Класс для управления сессией чата
+    
+    Чат хранится в формате JSONL: первая строка содержит метаданные
+    ({"_meta": {...}}), каждая следующая - одно сообщение. Новые сообщения
+    дописываются в конец файла, поэтому сохранение не зависит от длины чата.
+    """
     
     def __init__(self, name: Optional[str] = None):
         self.name = name or f"chat-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
@@ -37,52 +44,110 @@ class ChatSession:
             {"role": "system", "content": CHAT_SYSTEM_PROMPT}
         ]
         self.chats_dir = config.chats_directory
+        # Сколько сообщений уже записано на диск (None - файл еще не создан этой сессией)
+        self._saved: Optional[int] = None
+        # Кэш истории в формате Anthropic и число уже преобразованных сообщений
+        self._anthropic_messages: List[Dict[str, Any]] = []
+        self._anthropic_converted = 0
+    
+    @property
+    def filepath(self) -> Path:
+        """Путь к файлу чата"""
+        return self.chats_dir / f"{self.name}.jsonl"
     
-    def add_message(self, role: str, content: str):
-        """Добавить сообщение в историю"""
+    async def add_message(self, role: str, content: str):
+        """Добавить сообщение в историю и дописать его в файл (запись вне event loop)"""
         self.messages.append({"role": role, "content": content})
+        await asyncio.to_thread(self.save)
     
-    def save(self) -> Path:
-        """Сохранить чат в файл"""
-        self.chats_dir.mkdir(parents=True, exist_ok=True)
+    def to_anthropic_messages(self) -> List[Dict[str, Any]]:
+        """История в формате Anthropic (преобразуются только новые сообщения)"""
+        if self._anthropic_converted > len(self.messages):
+            # История была заменена целиком
+            self._anthropic_messages = []
+            self._anthropic_converted = 0
         
-        # Удалить системный промпт из сохранения
-        save_messages = [msg for msg in self.messages if msg["role"] != "system"]
+        self._anthropic_messages.extend(
+            build_anthropic_messages(self.messages[self._anthropic_converted:])
+        )
+        self._anthropic_converted = len(self.messages)
+        return self._anthropic_messages
+    
+    def save(self) -> Path:
+        """Сохранить несохраненные сообщения чата в файл"""
+        filepath = self.filepath
         
-        chat_data = {
-            "name": self.name,
-            "created": self.created,
-            "model": self.model,
-            "messages": save_messages
-        }
+        if self._saved is None:
+            # Первая запись сессии перезаписывает файл целиком, начиная с метаданных
+            self.chats_dir.mkdir(parents=True, exist_ok=True)
+            mode = "wb"
+            records = [{"_meta": {"name": self.name, "created": self.created, "model": self.model}}]
+            start = 0
+        else:
+            mode = "ab"
+            records = []
+            start = self._saved
         
-        filename = f"{self.name}.json"
-        filepath = self.chats_dir / filename
+        # Удалить системный промпт из сохранения
+        records.extend(msg for msg in self.messages[start:] if msg["role"] != "system")
         
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(chat_data, f, ensure_ascii=False, indent=2)
+        if records:
+            with open(filepath, mode) as f:
+                f.write(b"".join(orjson.dumps(record) + b"\n" for record in records))
         
+        self._saved = len(self.messages)
         return filepath
     
     @classmethod
     def load(cls, name: str) -> "ChatSession":
         """Загрузить чат из файла"""
         chats_dir = config.chats_directory
-        filepath = chats_dir / f"{name}.json"
+        filepath = chats_dir / f"{name}.jsonl"
+        legacy_filepath = chats_dir / f"{name}.json"
         
-        if not filepath.exists():
+        # Файл можно дописывать, только если он цел: иначе новая запись
+        # склеится с оборванной строкой и потеряется при следующей загрузке
+        intact = False
+        if filepath.exists():
+            meta = {}
+            messages = []
+            intact = True
+            with open(filepath, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        intact = False
+                    if not line.strip():
+                        continue
+                    try:
+                        record = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        # Оборванная последняя строка после аварийного завершения
+                        intact = False
+                        continue
+                    if "_meta" in record:
+                        meta = record["_meta"]
+                    else:
+                        messages.append(record)
+        elif legacy_filepath.exists():
+            # Чаты, сохраненные до перехода на JSONL
+            meta = orjson.loads(legacy_filepath.read_bytes())
+            messages = meta.get("messages", [])
+        else:
             raise FileNotFoundError(f"Чат '{name}' не найден")
         
-        with open(filepath, "r", encoding="utf-8") as f:
-            chat_data = json.load(f)
-        
-        session = cls(name=chat_data["name"])
-        session.created = chat_data.get("created", session.created)
-        session.model = chat_data.get("model", config.model_chat)
+        # Имя чата - это имя файла (как в list_chats): после переименования файла
+        # новые сообщения должны дописываться в него же, а не в файл из _meta
+        session = cls(name=name)
+        session.created = meta.get("created", session.created)
+        session.model = meta.get("model", config.model_chat)
         
         # Восстановить сообщения с системным промптом
         session.messages = [{"role": "system", "content": CHAT_SYSTEM_PROMPT}]
-        session.messages.extend(chat_data.get("messages", []))
+        session.messages.extend(messages)
+        
+        # Иначе (битый файл или старый .json) первое сохранение перезапишет файл целиком
+        if intact:
+            session._saved = len(session.messages)
         
         return session
     
@@ -93,15 +158,9 @@ class ChatSession:
         if not chats_dir.exists():
             return []
         
-        chats = []
-        for filepath in chats_dir.glob("*.json"):
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    chat_data = json.load(f)
-                    chats.append(chat_data.get("name", filepath.stem))
-            except Exception:
-                continue
-        
+        # Файл сохраняется как {name}.jsonl, поэтому имя чата совпадает с именем файла
+        chats = {filepath.stem for filepath in chats_dir.glob("*.jsonl")}
+        chats.update(filepath.stem for filepath in chats_dir.glob("*.json"))
         return sorted(chats)
 
 
@@ -143,34 +202,34 @@ async def chat_command(chat_name: Optional[str] = None, verbose: bool = False):
                 
                 # Обработка команд
                 if user_input.startswith("/"):
-                    command = user_input.split()[0]
+                    parts = user_input.split(maxsplit=1)
+                    command = parts[0]
+                    arg = parts[1].strip() if len(parts) > 1 else None
                     
                     if command == "/exit":
                         console.print("[yellow]Выход из чата...[/yellow]")
                         break
                     
                     elif command == "/save":
-                        filepath = session.save()
+                        filepath = await asyncio.to_thread(session.save)
                         console.print(f"[green]✓ Чат сохранен: {filepath}[/green]\n")
                         continue
                     
                     elif command == "/new":
-                        name = " ".join(user_input.split()[1:]) if len(user_input.split()) > 1 else None
-                        session = ChatSession(name=name)
+                        session = ChatSession(name=arg)
                         console.print(f"[green]✓ Создан новый чат: {session.name}[/green]\n")
                         continue
                     
                     elif command == "/load":
-                        if len(user_input.split()) < 2:
+                        if not arg:
                             console.print("[red]Укажите название чата: /load <название>[/red]\n")
                             continue
                         
-                        name = " ".join(user_input.split()[1:])
                         try:
-                            session = ChatSession.load(name)
+                            session = ChatSession.load(arg)
                             console.print(f"[green]✓ Загружен чат: {session.name}[/green]\n")
                         except FileNotFoundError:
-                            console.print(f"[red]Чат '{name}' не найден[/red]\n")
+                            console.print(f"[red]Чат '{arg}' не найден[/red]\n")
                         continue
                     
                     elif command == "/list":
@@ -191,24 +250,27 @@ async def chat_command(chat_name: Optional[str] = None, verbose: bool = False):
                         continue
                 
                 # Отправка сообщения
-                session.add_message("user", user_input)
+                await session.add_message("user", user_input)
                 
                 console.print("[bold green]AI[/bold green]")
-                response_text = ""
-                
-                # Streaming ответ
-                async for chunk in api_client.chat_completion(
-                    model=session.model,
-                    messages=session.messages,
-                    temperature=0.7,
-                    max_tokens=4000,
-                    stream=True,
-                ):
-                    response_text += chunk
-                    console.print(chunk, end="", markup=False)
+                # Streaming ответ; Markdown пересобирается не чаще 30 раз в секунду
+                response_text = await render_stream(
+                    api_client.chat_completion(
+                        model=session.model,
+                        messages=session.messages,
+                        temperature=0.7,
+                        max_tokens=4000,
+                        stream=True,
+                        anthropic_messages=session.to_anthropic_messages(),
+                    ),
+                    console,
+                    clean=False,
+                    refresh_per_second=30,
+                    vertical_overflow="visible",
+                )
                 
-                console.print("\n")
-                session.add_message("assistant", response_text)
+                console.print()
+                await session.add_message("assistant", response_text)
             
             except KeyboardInterrupt:
                 console.print("\n[yellow]Прервано. Используйте /exit для выхода[/yellow]\n")
@@ -220,7 +282,7 @@ async def chat_command(chat_name: Optional[str] = None, verbose: bool = False):
         # Автосохранение при выходе
         if session:
             try:
-                session.save()
+                await asyncio.to_thread(session.save)
                 console.print("[dim]Чат автоматически сохранен[/dim]")
             except Exception:
                 pass
@@ -229,14 +291,16 @@ async def chat_command(chat_name: Optional[str] = None, verbose: bool = False):
         console.print("\n[yellow]Выход из чата...[/yellow]")
         if session:
             try:
-                session.save()
+                await asyncio.to_thread(session.save)
             except Exception:
                 pass
     except Exception as e:
         console.print(f"[red]Критическая ошибка: {e}[/red]")
         raise
+    finally:
+        await api_client.aclose()
 
 
 def run_chat(chat_name: Optional[str] = None, verbose: bool = False):
     """Синхронная обертка для команды chat"""
-    asyncio.run(chat_command(chat_name, verbose))
+    run_oneshot(chat_command(chat_name, verbose))
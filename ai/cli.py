@@ -1,87 +1,146 @@
 """CLI точка входа для приложения"""
 
+import argparse
+import atexit
+import functools
 import logging
+import logging.handlers
+import queue
 import sys
 from pathlib import Path
+from typing import List, Optional
 
-import click
 from rich.console import Console
 
-from ai.config import config
-from ai.search import run_search
-from ai.ask import run_ask
-from ai.chat import run_chat
+from ai import __version__
+from ai._logging import BatchedFileHandler
 
 console = Console()
 
-# Настройка логирования
-log_file = config.log_file
-log_file.parent.mkdir(parents=True, exist_ok=True)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file, encoding="utf-8"),
-        # Не выводим логи в консоль, только в файл
-    ]
-)
-
-# Отключаем логирование httpx в консоль
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("httpcore").setLevel(logging.WARNING)
-
-
-@click.group()
-@click.version_option(version="0.1.0")
-def cli():
-    """AI CLI помощник для Arch Linux с ProxyAPI"""
-    pass
-
-
-@cli.command()
-@click.argument("query", required=True)
-@click.option("--verbose", "-v", is_flag=True, help="Показать дополнительную информацию")
+def _get_config():
+    """Загрузить конфигурацию (не нужна для --help и --version)"""
+    from ai.config import config
+    return config
+
+
+def handle_errors(func):
+    """Декоратор команд: прерывание и ошибки выводятся в консоль и завершают процесс"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except KeyboardInterrupt:
+            console.print("\n[yellow]Прервано пользователем[/yellow]")
+            sys.exit(0)
+        except Exception as e:
+            console.print(f"[red]Ошибка: {e}[/red]")
+            sys.exit(1)
+    
+    return wrapper
+
+
+def _setup_logging():
+    """Настройка логирования"""
+    log_file = _get_config().log_file
+    
+    # Запись в файл выполняется в отдельном потоке, логгеры только кладут записи в очередь.
+    # Директория и файл лога создаются только при первой записи.
+    # Записи копятся в памяти и пишутся в файл пачками одним writev.
+    log_queue = queue.SimpleQueue()
+    file_handler = BatchedFileHandler(log_file)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    
+    def stop_logging():
+        listener.stop()
+        file_handler.close()
+    
+    atexit.register(stop_logging)
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.handlers.QueueHandler(log_queue),
+            # Не выводим логи в консоль, только в файл
+        ]
+    )
+    
+    # Отключаем логирование httpx в консоль
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+
+
+@handle_errors
 def search(query: str, verbose: bool):
     """Быстрый веб-поиск"""
-    try:
-        run_search(query, verbose)
-    except KeyboardInterrupt:
-        console.print("\n[yellow]Прервано пользователем[/yellow]")
-        sys.exit(0)
-    except Exception as e:
-        console.print(f"[red]Ошибка: {e}[/red]")
-        sys.exit(1)
+    from ai.search import run_search
+    
+    run_search(query, verbose)
 
 
-@cli.command()
-@click.argument("question", required=True)
-@click.option("--verbose", "-v", is_flag=True, help="Показать дополнительную информацию")
+@handle_errors
 def ask(question: str, verbose: bool):
     """Одиночные вопросы (до 3 обменов)"""
-    try:
-        run_ask(question, verbose)
-    except KeyboardInterrupt:
-        console.print("\n[yellow]Прервано пользователем[/yellow]")
-        sys.exit(0)
-    except Exception as e:
-        console.print(f"[red]Ошибка: {e}[/red]")
-        sys.exit(1)
+    from ai.ask import run_ask
+    
+    run_ask(question, verbose)
 
 
-@cli.command()
-@click.argument("name", required=False)
-@click.option("--verbose", "-v", is_flag=True, help="Показать дополнительную информацию")
-def chat(name: str, verbose: bool):
+@handle_errors
+def chat(name: Optional[str], verbose: bool):
     """Интерактивный чат с сохранением"""
-    try:
-        run_chat(name, verbose)
-    except KeyboardInterrupt:
-        console.print("\n[yellow]Прервано пользователем[/yellow]")
-        sys.exit(0)
-    except Exception as e:
-        console.print(f"[red]Ошибка: {e}[/red]")
-        sys.exit(1)
+    from ai.chat import run_chat
+    
+    run_chat(name, verbose)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    """Построить парсер аргументов командной строки"""
+    parser = argparse.ArgumentParser(
+        prog="ai",
+        description="AI CLI помощник для Arch Linux с ProxyAPI",
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s, version {__version__}")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    
+    verbose_help = "Показать дополнительную информацию"
+    
+    search_parser = subparsers.add_parser("search", help="Быстрый веб-поиск", description="Быстрый веб-поиск")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--verbose", "-v", action="store_true", help=verbose_help)
+    search_parser.set_defaults(handler=lambda args: search(args.query, args.verbose))
+    
+    ask_parser = subparsers.add_parser(
+        "ask", help="Одиночные вопросы (до 3 обменов)", description="Одиночные вопросы (до 3 обменов)"
+    )
+    ask_parser.add_argument("question")
+    ask_parser.add_argument("--verbose", "-v", action="store_true", help=verbose_help)
+    ask_parser.set_defaults(handler=lambda args: ask(args.question, args.verbose))
+    
+    chat_parser = subparsers.add_parser(
+        "chat", help="Интерактивный чат с сохранением", description="Интерактивный чат с сохранением"
+    )
+    chat_parser.add_argument("name", nargs="?")
+    chat_parser.add_argument("--verbose", "-v", action="store_true", help=verbose_help)
+    chat_parser.set_defaults(handler=lambda args: chat(args.name, args.verbose))
+    
+    return parser
+
+
+def cli(argv: Optional[List[str]] = None):
+    """AI CLI помощник для Arch Linux с ProxyAPI"""
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    
+    # Без команды показываем справку
+    if args.command is None:
+        parser.print_help()
+        return
+    
+    _setup_logging()
+    args.handler(args)
 
 
 def main():
@@ -2,44 +2,93 @@
 
 import os
 import sys
+import tomllib
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import NoReturn, Optional
 
-try:
-    import tomllib
- except ImportError:
-    import tomli as tomllib
+# Домашняя директория определяется один раз при импорте
+_HOME = Path(os.environ.get("HOME") or os.path.expanduser("~"))
 
-from rich.console import Console
-from rich.panel import Panel
+# Конфигурация по умолчанию, записывается при первом запуске
+_DEFAULT_CONFIG_BYTES = b"""[api]
+proxyapi_key = "sk-..."
+base_url = "https://api.proxyapi.ru/openrouter/v1"
 
-console = Console()
+[models]
+search = "perplexity/sonar"
+ask = "deepseek/deepseek-v3.2"
+chat = "claude-opus-4-5-20251101"
+
+[storage]
+chats_dir = "~/.local/share/ai/chats"
+"""
+
+
+def _fail(message) -> NoReturn:
+    """Вывести ошибку конфигурации и завершить программу"""
+    # Rich импортируется только здесь: при корректной конфигурации он не нужен
+    from rich.console import Console
+    
+    Console().print(message)
+    sys.exit(1)
+
+
+def _flatten(data: dict, prefix: str = "") -> dict:
+    """Развернуть вложенные таблицы TOML в плоский словарь (ключи вида models.search)"""
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+@dataclass(slots=True, frozen=True)
+class _Resolved:
+    """Значения конфигурации, вычисленные один раз при загрузке"""
+    api_key: str = field(repr=False)
+    base_url: str
+    model_search: str
+    model_ask: str
+    model_chat: str
+    chats_directory: Path
 
 
 class Config:
     """Класс для работы с конфигурацией"""
     
     def __init__(self):
-        self.config_dir = Path.home() / ".config" / "ai"
+        self.config_dir = _HOME / ".config" / "ai"
         self.config_file = self.config_dir / "config.toml"
-        self.chats_dir = Path.home() / ".local" / "share" / "ai" / "chats"
-        self.log_file = Path.home() / ".local" / "share" / "ai" / "ai.log"
+        self.chats_dir = _HOME / ".local" / "share" / "ai" / "chats"
+        self.log_file = _HOME / ".local" / "share" / "ai" / "ai.log"
+        # Маркер того, что директории уже созданы при одном из прошлых запусков
+        self.init_marker = self.log_file.parent / ".initialized"
         
         self._config = None
+        self._resolved: Optional[_Resolved] = None
         self._load_config()
         self._ensure_directories()
     
     def _ensure_directories(self):
-        """Создать необходимые директории"""
+        """Создать необходимые директории (один раз, дальше проверяется только маркер)"""
+        if self.init_marker.exists():
+            return
+        
         self.config_dir.mkdir(parents=True, exist_ok=True)
         self.chats_dir.mkdir(parents=True, exist_ok=True)
         self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        self.init_marker.touch()
     
     def _load_config(self):
         """Загрузить конфигурацию из файла"""
         if not self.config_file.exists():
+            from rich.panel import Panel
+            
             self._create_default_config()
-            console.print(
+            _fail(
                 Panel(
                     f"[yellow]Создан файл конфигурации: {self.config_file}[/yellow]\n"
                     "[red]Пожалуйста, добавьте ваш ProxyAPI ключ в config.toml[/red]",
@@ -47,69 +96,79 @@ class Config:
                     border_style="yellow"
                 )
             )
-            sys.exit(1)
         
         try:
             with open(self.config_file, "rb") as f:
                 self._config = tomllib.load(f)
         except Exception as e:
-            console.print(f"[red]Ошибка чтения конфигурации: {e}[/red]")
-            sys.exit(1)
+            _fail(f"[red]Ошибка чтения конфигурации: {e}[/red]")
+        
+        self._resolved = self._resolve(_flatten(self._config))
+    
+    def _resolve(self, flat: dict) -> _Resolved:
+        """Вычислить значения конфигурации с учетом значений по умолчанию"""
+        key = flat.get("api.proxyapi_key", "")
+        if not key or key == "sk-...":
+            _fail("[red]Ошибка: ProxyAPI ключ не настроен в config.toml[/red]")
+        
+        return _Resolved(
+            api_key=key,
+            base_url=flat.get("api.base_url", "https://api.proxyapi.ru/openrouter/v1"),
+            model_search=flat.get("models.search", "perplexity/sonar"),
+            model_ask=flat.get("models.ask", "deepseek/deepseek-v3.2"),
+            model_chat=flat.get("models.chat", "anthropic/claude-opus-4.5"),
+            chats_directory=Path(flat.get("storage.chats_dir", "~/.local/share/ai/chats")).expanduser(),
+        )
     
     def _create_default_config(self):
         """Создать конфигурацию по умолчанию"""
-        default_config = """[api]
-proxyapi_key = "sk-..."
-base_url = "https://api.proxyapi.ru/openrouter/v1"
-
-[models]
-search = "perplexity/sonar"
-ask = "deepseek/deepseek-v3.2"
-chat = "claude-opus-4-5-20251101"
-
-[storage]
-chats_dir = "~/.local/share/ai/chats"
-"""
-        self.config_file.write_text(default_config, encoding="utf-8")
+        self.config_dir.mkdir(parents=True, exist_ok=True)
+        self.config_file.write_bytes(_DEFAULT_CONFIG_BYTES)
     
     @property
     def api_key(self) -> str:
         """Получить API ключ"""
-        key = self._config.get("api", {}).get("proxyapi_key", "")
-        if not key or key == "sk-...":
-            console.print("[red]Ошибка: ProxyAPI ключ не настроен в config.toml[/red]")
-            sys.exit(1)
-        return key
+        return self._resolved.api_key
     
     @property
     def base_url(self) -> str:
         """Получить базовый URL API"""
-        return self._config.get("api", {}).get(
-            "base_url", 
-            "https://api.proxyapi.ru/openrouter/v1"
-        )
+        return self._resolved.base_url
     
     @property
     def model_search(self) -> str:
         """Модель для поиска"""
-        return self._config.get("models", {}).get("search", "perplexity/sonar")
+        return self._resolved.model_search
     
     @property
     def model_ask(self) -> str:
         """Модель для вопросов"""
-        return self._config.get("models", {}).get("ask", "deepseek/deepseek-v3.2")
+        return self._resolved.model_ask
     
     @property
     def model_chat(self) -> str:
         """Модель для чата"""
-        return self._config.get("models", {}).get("chat", "anthropic/claude-opus-4.5")
+        return self._resolved.model_chat
     
     @property
     def chats_directory(self) -> Path:
         """Директория для сохранения чатов"""
-        chats_dir = self._config.get("storage", {}).get("chats_dir", "~/.local/share/ai/chats")
-        return Path(chats_dir).expanduser()
+        return self._resolved.chats_directory
+
+
+class _LazyConfig:
+    """Прокси, который загружает Config при первом обращении к атрибуту"""
+    
+    __slots__ = ("_real",)
+    
+    def __getattr__(self, name: str):
+        try:
+            real = object.__getattribute__(self, "_real")
+        except AttributeError:
+            real = Config()
+            object.__setattr__(self, "_real", real)
+        return getattr(real, name)
 
 
-# Глобальный экземпляр конфигурации
-config = Config()
+# Глобальный экземпляр конфигурации (файл читается только при первом использовании)
+config = _LazyConfig()
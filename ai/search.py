@@ -1,10 +1,9 @@
 """Команда search - быстрый веб-поиск"""
 
-import asyncio
-import re
 from rich.console import Console
-from rich.markdown import Markdown
 
+from ai._live import render_stream
+from ai._runloop import run_oneshot
 from ai.api import api_client
 from ai.config import config
 
@@ -34,29 +33,26 @@ async def search_command(query: str, verbose: bool = False):
             console.print(f"[dim]Модель: {config.model_search}[/dim]")
             console.print(f"[dim]Temperature: 0.3[/dim]\n")
         
-        response = await api_client.get_completion(
-            model=config.model_search,
-            messages=messages,
-            temperature=0.3,
+        # Ответ очищается от ссылок на источники по мере поступления и сразу отрисовывается
+        await render_stream(
+            api_client.get_completion_stream(
+                model=config.model_search,
+                messages=messages,
+                temperature=0.3,
+            ),
+            console,
         )
         
-        # Очистка ответа от квадратных скобок с цифрами (ссылки на источники)
-        cleaned_response = re.sub(r'\[\d+\]', '', response)
-        # Удаление множественных пробелов после очистки
-        cleaned_response = re.sub(r'\s+', ' ', cleaned_response)
-        # Удаление пробелов в начале строк
-        cleaned_response = re.sub(r'\n\s+', '\n', cleaned_response)
-        
-        console.print(Markdown(cleaned_response))
-        
         if verbose:
             console.print(f"\n[dim]Запрос выполнен успешно[/dim]")
     
     except Exception as e:
         console.print(f"[red]Ошибка при выполнении поиска: {e}[/red]")
         raise
+    finally:
+        await api_client.aclose()
 
 
 def run_search(query: str, verbose: bool = False):
     """Синхронная обертка для команды search"""
-    asyncio.run(search_command(query, verbose))
+    run_oneshot(search_command(query, verbose))
@@ -0,0 +1,22 @@
+"""
+Сборка с опциональной компиляцией через mypyc
+
+Метаданные проекта описаны в pyproject.toml. При AI_CLI_MYPYC=1 чистые
+вычислительные модули (очистка ответов) компилируются в C-расширения:
+    AI_CLI_MYPYC=1 pip install .
+"""
+
+import os
+
+from setuptools import setup
+
+# Только модули без ввода-вывода: остальной код ждет сеть и диск
+MYPYC_MODULES = ["ai/_clean.py"]
+
+ext_modules = []
+if os.environ.get("AI_CLI_MYPYC"):
+    from mypyc.build import mypycify
+    
+    ext_modules = mypycify(MYPYC_MODULES, opt_level="3")
+
+setup(ext_modules=ext_modules)
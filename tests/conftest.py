@@ -0,0 +1,15 @@
+"""Общие настройки тестов"""
+
+import atexit
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# ai.api создает клиента при импорте и читает ~/.config/ai/config.toml,
+# поэтому тесты работают во временной домашней директории с тестовым ключом
+_home = Path(tempfile.mkdtemp(prefix="ai-cli-tests-"))
+(_home / ".config" / "ai").mkdir(parents=True)
+(_home / ".config" / "ai" / "config.toml").write_text('[api]\nproxyapi_key = "sk-test"\n', encoding="utf-8")
+os.environ["HOME"] = str(_home)
+atexit.register(shutil.rmtree, _home, ignore_errors=True)
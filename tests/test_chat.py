@@ -0,0 +1,112 @@
+"""Тесты хранения чатов в JSONL (ai.chat)"""
+
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from ai import chat
+from ai.chat import ChatSession
+
+
+@pytest.fixture
+def chats_dir(tmp_path, monkeypatch):
+    """Директория чатов во временной папке вместо пользовательской"""
+    monkeypatch.setattr(chat, "config", SimpleNamespace(model_chat="test-model", chats_directory=tmp_path))
+    return tmp_path
+
+
+def add_message(session, role, content):
+    asyncio.run(session.add_message(role, content))
+
+
+def read_records(path):
+    return [orjson.loads(line) for line in path.read_bytes().splitlines()]
+
+
+def contents(session):
+    return [msg["content"] for msg in session.messages if msg["role"] != "system"]
+
+
+def test_save_writes_meta_and_messages(chats_dir):
+    session = ChatSession("t")
+    add_message(session, "user", "one")
+    add_message(session, "assistant", "two")
+    
+    records = read_records(chats_dir / "t.jsonl")
+    assert records[0]["_meta"] == {"name": "t", "created": session.created, "model": "test-model"}
+    assert records[1:] == [
+        {"role": "user", "content": "one"},
+        {"role": "assistant", "content": "two"},
+    ]
+
+
+def test_load_then_append(chats_dir):
+    session = ChatSession("t")
+    add_message(session, "user", "one")
+    
+    loaded = ChatSession.load("t")
+    assert contents(loaded) == ["one"]
+    assert loaded.created == session.created
+    add_message(loaded, "assistant", "two")
+    
+    records = read_records(chats_dir / "t.jsonl")
+    assert sum("_meta" in record for record in records) == 1
+    assert contents(ChatSession.load("t")) == ["one", "two"]
+
+
+def test_torn_last_line_is_not_appended_to(chats_dir):
+    session = ChatSession("t")
+    add_message(session, "user", "one")
+    add_message(session, "assistant", "two")
+    
+    # Аварийное завершение посреди записи последней строки
+    path = chats_dir / "t.jsonl"
+    path.write_bytes(path.read_bytes()[:-10])
+    
+    loaded = ChatSession.load("t")
+    assert contents(loaded) == ["one"]
+    add_message(loaded, "user", "three")
+    add_message(loaded, "assistant", "four")
+    
+    assert contents(ChatSession.load("t")) == ["one", "three", "four"]
+    assert path.read_bytes().endswith(b"\n")
+
+
+def test_renamed_file_keeps_its_name(chats_dir):
+    add_message(ChatSession("foo"), "user", "one")
+    (chats_dir / "foo.jsonl").rename(chats_dir / "bar.jsonl")
+    
+    add_message(ChatSession.load("bar"), "user", "two")
+    
+    assert not (chats_dir / "foo.jsonl").exists()
+    assert contents(ChatSession.load("bar")) == ["one", "two"]
+
+
+def test_legacy_json_is_migrated(chats_dir):
+    legacy = {
+        "name": "old",
+        "created": "2024-01-01T00:00:00Z",
+        "model": "old-model",
+        "messages": [
+            {"role": "user", "content": "one"},
+            {"role": "assistant", "content": "two"},
+        ],
+    }
+    (chats_dir / "old.json").write_bytes(orjson.dumps(legacy))
+    
+    loaded = ChatSession.load("old")
+    assert contents(loaded) == ["one", "two"]
+    assert loaded.model == "old-model"
+    add_message(loaded, "user", "three")
+    
+    records = read_records(chats_dir / "old.jsonl")
+    assert records[0]["_meta"]["created"] == "2024-01-01T00:00:00Z"
+    assert [record["content"] for record in records[1:]] == ["one", "two", "three"]
+    assert ChatSession.list_chats() == ["old"]
+
+
+def test_missing_chat(chats_dir):
+    with pytest.raises(FileNotFoundError):
+        ChatSession.load("nope")
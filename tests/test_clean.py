@@ -0,0 +1,77 @@
+"""Тесты очистки ответов (ai._clean)"""
+
+import random
+import re
+
+import pytest
+
+from ai._clean import StreamCleaner, clean_response
+
+# Символы, из которых складываются все пограничные случаи: ссылки, пробелы, переводы строк
+ALPHABET = "ab [1]2]\n \t["
+
+SAMPLES = [
+    "",
+    "Ответ [1] с  ссылками [23]\n  и пробелами.",
+    "[1][2][3]",
+    "a [12",
+    "a [",
+    "[x] [] [١٢]",
+    "\n \t [4]\n\tb",
+    "код:\n    отступ [5]\n",
+]
+
+
+def reference_clean(text: str) -> str:
+    """Исходная очистка тремя регулярными выражениями"""
+    text = re.sub(r"\[\d+\]", "", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    return re.sub(r"\n[ \t]+", "\n", text)
+
+
+def feed_all(chunks) -> str:
+    """Пропустить чанки через StreamCleaner и собрать результат"""
+    cleaner = StreamCleaner()
+    return "".join(cleaner.feed(chunk) for chunk in chunks) + cleaner.flush()
+
+
+def random_split(rng: random.Random, text: str):
+    """Разбить текст на чанки случайной длины (включая пустые)"""
+    chunks = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(0, 5)
+        chunks.append(text[pos:pos + size])
+        pos += size
+    return chunks
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_clean_response_matches_reference(text):
+    assert clean_response(text) == reference_clean(text)
+
+
+def test_clean_response_matches_reference_random():
+    rng = random.Random(0)
+    for _ in range(5000):
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40)))
+        assert clean_response(text) == reference_clean(text), repr(text)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_stream_cleaner_every_two_way_split(text):
+    for split in range(len(text) + 1):
+        assert feed_all([text[:split], text[split:]]) == clean_response(text)
+
+
+def test_stream_cleaner_single_characters():
+    text = "".join(SAMPLES)
+    assert feed_all(text) == clean_response(text)
+
+
+def test_stream_cleaner_random_splits():
+    rng = random.Random(1)
+    for _ in range(5000):
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40)))
+        chunks = random_split(rng, text)
+        assert feed_all(chunks) == clean_response(text), repr(chunks)
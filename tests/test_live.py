@@ -0,0 +1,60 @@
+"""Тесты отрисовки streaming ответа (ai._live)"""
+
+import asyncio
+import io
+
+from rich.console import Console
+
+from ai import _live
+from ai._clean import clean_response
+from ai._live import render_stream
+
+TEXT = "Ответ [1] с  ссылками [23]\n  и пробелами. " * 20
+
+
+async def stream(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def split(text, size=3):
+    return [text[pos:pos + size] for pos in range(0, len(text), size)]
+
+
+def quiet_console():
+    return Console(file=io.StringIO(), force_terminal=False)
+
+
+def test_returns_cleaned_text():
+    result = asyncio.run(render_stream(stream(split(TEXT)), quiet_console()))
+    assert result == clean_response(TEXT)
+
+
+def test_clean_disabled_returns_raw_text():
+    result = asyncio.run(render_stream(stream(split(TEXT)), quiet_console(), clean=False))
+    assert result == TEXT
+
+
+def test_burst_is_not_redrawn_per_chunk(monkeypatch):
+    updates = []
+    
+    class FakeLive:
+        def __init__(self, *args, **kwargs):
+            pass
+        
+        def __enter__(self):
+            return self
+        
+        def __exit__(self, *exc):
+            pass
+        
+        def update(self, renderable):
+            updates.append(renderable)
+    
+    # Пачка чанков, пришедших без пауз (например, накопленный backlog потока)
+    monkeypatch.setattr(_live, "Live", FakeLive)
+    
+    asyncio.run(render_stream(stream(["x"] * 1000), quiet_console(), refresh_per_second=10))
+    
+    # Одна финальная перерисовка (плюс, возможно, одна по таймеру), а не по одной на пачку чанков
+    assert 1 <= len(updates) <= 2
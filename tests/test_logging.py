@@ -0,0 +1,80 @@
+"""Тесты пакетной записи лога (ai._logging)"""
+
+import logging
+import os
+
+from ai import _logging
+from ai._logging import BatchedFileHandler
+
+
+def make_logger(handler: logging.Handler) -> logging.Logger:
+    """Отдельный логгер, который пишет только в handler"""
+    logger = logging.getLogger(f"test.{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    return logger
+
+
+def short_writev(fd, buffers):
+    """writev, который каждый раз записывает не больше 7 байт"""
+    return os.write(fd, b"".join(buffers)[:7])
+
+
+def test_file_is_created_lazily(tmp_path):
+    log_file = tmp_path / "logs" / "ai.log"
+    handler = BatchedFileHandler(log_file)
+    handler.close()
+    assert not log_file.parent.exists()
+
+
+def test_short_writev_writes_everything(tmp_path, monkeypatch):
+    monkeypatch.setattr(_logging.os, "writev", short_writev)
+    log_file = tmp_path / "ai.log"
+    handler = BatchedFileHandler(log_file, capacity=5)
+    logger = make_logger(handler)
+    
+    lines = [f"запись {i} " + "я" * (i % 13) for i in range(100)]
+    for line in lines:
+        logger.info(line)
+    handler.close()
+    
+    assert log_file.read_text(encoding="utf-8").splitlines() == lines
+
+
+def test_write_fallback_without_writev(tmp_path, monkeypatch):
+    monkeypatch.delattr(_logging.os, "writev")
+    log_file = tmp_path / "ai.log"
+    handler = BatchedFileHandler(log_file)
+    logger = make_logger(handler)
+    
+    logger.info("первая")
+    logger.info("вторая")
+    handler.close()
+    
+    assert log_file.read_text(encoding="utf-8") == "первая\nвторая\n"
+
+
+def test_error_flushes_immediately(tmp_path):
+    log_file = tmp_path / "ai.log"
+    handler = BatchedFileHandler(log_file, flush_interval=3600)
+    logger = make_logger(handler)
+    
+    logger.info("в буфере")
+    assert not log_file.exists()
+    logger.error("ошибка")
+    assert log_file.read_text(encoding="utf-8") == "в буфере\nошибка\n"
+    handler.close()
+
+
+def test_zero_byte_writev_does_not_hang(tmp_path, monkeypatch):
+    monkeypatch.setattr(_logging.os, "writev", lambda fd, buffers: 0)
+    errors = []
+    handler = BatchedFileHandler(tmp_path / "ai.log")
+    handler.handleError = errors.append
+    logger = make_logger(handler)
+    
+    logger.error("ошибка")
+    handler.close()
+    
+    assert len(errors) == 1